@@ -1,107 +1,182 @@
-from svg_mark2 import layout_to_svg
-from svg_mark2 import load_layout_from_db   # 👈 THIS IS REQUIRED
-
 import streamlit as st
 import sqlite3
 import json
+import zlib
 from datetime import datetime
-from typing import Optional, Dict, Any
-import os
+from typing import Optional, Dict, Any, List, Union
+import atexit
+import threading
 from plot_drawer import PlotDrawerUI  
-def init_db():
-    """Initialize SQLite database"""
-    conn = sqlite3.connect('projectsData.db')
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS projects (
-            project_id TEXT PRIMARY KEY,
-            project_name TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            data_json TEXT NOT NULL
-        )
-    """)
 
-    conn.commit()
+@st.cache_resource
+def get_conn() -> sqlite3.Connection:
+    """Shared SQLite connection, kept open across reruns and sessions"""
+    conn = sqlite3.connect('projectsData.db', check_same_thread=False, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+
+    # WAL + NORMAL: commits append to the WAL instead of fsyncing the main file,
+    # and readers no longer block on the writer
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute("PRAGMA cache_size=-20000")
+
+    atexit.register(close_conn, conn)
+    return conn
+
+def close_conn(conn: sqlite3.Connection):
+    """Refresh planner statistics before the process exits"""
+    conn.execute("PRAGMA optimize")
     conn.close()
 
-def save_project(project_data: Dict[str, Any]) -> str:
-    """Save project to database handling different schemas"""
-    conn = sqlite3.connect('projectsData.db')
+@st.cache_resource
+def get_db_lock() -> threading.Lock:
+    """Serializes access to the shared connection across Streamlit threads"""
+    return threading.Lock()
+
+@st.cache_resource
+def init_db() -> frozenset:
+    """Initialize SQLite database (once per process) and return its column names"""
+    conn = get_conn()
     cursor = conn.cursor()
 
+    with get_db_lock():
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS projects (
+                project_id TEXT PRIMARY KEY,
+                project_name TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                data_json BLOB NOT NULL
+            )
+        """)
+        # Covers load_all_projects: newest-first listing without a table scan + sort
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_projects_created_at
+            ON projects (created_at DESC, project_id, project_name)
+        """)
+        cursor.execute("PRAGMA optimize")
+
+        # Legacy databases carry extra columns (city_region, num_floors)
+        cursor.execute("PRAGMA table_info(projects)")
+        return frozenset(row[1] for row in cursor.fetchall())
+
+# Serialized projects at least this large are stored zlib-compressed
+DATA_COMPRESS_MIN_BYTES = 1024
+
+def encode_project_data(project_data: Dict[str, Any]) -> Union[str, bytes]:
+    """Serialize project data for the data_json column"""
+    data = json.dumps(project_data, separators=(',', ':'), default=str)
+    if len(data) < DATA_COMPRESS_MIN_BYTES:
+        return data
+    return zlib.compress(data.encode('utf-8'))
+
+def decode_project_data(raw: Union[str, bytes]) -> Dict[str, Any]:
+    """Inverse of encode_project_data; plain-text rows are read as-is"""
+    if isinstance(raw, bytes):
+        raw = zlib.decompress(raw)
+    return json.loads(raw)
+
+# "Number of Floors" choices and the floor count each one stands for
+FLOOR_COUNT = {"Ground": 1, "Ground + 1": 2, "Ground + 2": 3, "Ground + 3": 4}
+
+def build_project_row(project_data: Dict[str, Any]) -> tuple:
+    """Map project data onto INSERT_COLS, handling different schemas"""
     project_id = project_data.get('project_id', f"PROJ_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
 
-    # 1. Detect columns in the existing table
-    cursor.execute("PRAGMA table_info(projects)")
-    existing_columns = {row[1] for row in cursor.fetchall()}
-
-    # 2. Prepare data
+    # 1. Prepare data
     insert_data = {
         'project_id': project_id,
         'project_name': project_data.get('project_name', 'Untitled'),
         'updated_at': datetime.now().isoformat(),
-        'data_json': json.dumps(project_data, indent=2, default=str)
+        'data_json': encode_project_data(project_data)
     }
 
-    # 3. Handle Legacy Columns (city_region, num_floors) if they exist
-    if 'city_region' in existing_columns:
+    # 2. Handle Legacy Columns (city_region, num_floors) if they exist
+    if 'city_region' in EXISTING_COLUMNS:
         insert_data['city_region'] = project_data.get('city_region', 'Unknown')
 
-    if 'num_floors' in existing_columns:
+    if 'num_floors' in EXISTING_COLUMNS:
         # Convert string "Ground + 1" to integer for DB column if needed
         floors_val = project_data.get('num_floors', 1)
         if isinstance(floors_val, str):
-            if "Ground" in floors_val:
-                if "+" in floors_val:
-                    try:
-                        floors_val = 1 + int(floors_val.split("+")[1])
-                    except:
-                        floors_val = 2
-                else:
-                    floors_val = 1
-            else:
-                floors_val = 1
+            floors_val = FLOOR_COUNT.get(floors_val, 1)
         insert_data['num_floors'] = int(floors_val)
 
-    # 4. Construct Dynamic Query
-    columns = list(insert_data.keys())
-    placeholders = ",".join(["?"] * len(columns))
-    col_str = ",".join(columns)
-    values = [insert_data[col] for col in columns]
+    # 3. Bind in the order of the prebuilt statement
+    return tuple(insert_data[col] for col in INSERT_COLS)
 
-    query = f"INSERT OR REPLACE INTO projects ({col_str}) VALUES ({placeholders})"
+def _write_project_rows(rows: List[tuple]):
+    """Write rows in a single transaction (one commit, one WAL sync)"""
+    conn = get_conn()
 
-    cursor.execute(query, values)
-    conn.commit()
-    conn.close()
-    return project_id
+    with get_db_lock():
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(INSERT_SQL, rows)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
 
-def load_all_projects() -> list:
-    """Load all projects from database"""
-    conn = sqlite3.connect('projectsData.db')
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT project_id, project_name, created_at FROM projects ORDER BY created_at DESC")
-    projects = cursor.fetchall()
-    conn.close()
-
-    return projects
+    # Drop cached reads so the home/view pages pick up the change
+    load_all_projects.clear()
+    load_project_data.clear()
+    load_project_download.clear()
 
+def save_project(project_data: Dict[str, Any]) -> str:
+    """Save project to database"""
+    row = build_project_row(project_data)
+    _write_project_rows([row])
+    return row[0]
+
+def save_projects_bulk(projects: List[Dict[str, Any]]) -> List[str]:
+    """Save many projects in one transaction.
+
+    Generated project IDs only have one-second resolution, so imports should
+    carry their own 'project_id' to avoid overwriting each other.
+    """
+    rows = [build_project_row(p) for p in projects]
+    _write_project_rows(rows)
+    return [row[0] for row in rows]
+
+# Projects listed per home page
+PROJECTS_PER_PAGE = 50
+
+@st.cache_data(ttl=60)
+def load_all_projects(limit: int = PROJECTS_PER_PAGE, offset: int = 0) -> list:
+    """Load a page of projects from database, newest first"""
+    conn = get_conn()
+
+    with get_db_lock():
+        projects = conn.execute(
+            "SELECT project_id, project_name, created_at FROM projects ORDER BY created_at DESC LIMIT ? OFFSET ?",
+            (limit, offset)
+        ).fetchall()
+
+    return [tuple(row) for row in projects]
+
+@st.cache_data(ttl=60)
 def load_project_data(project_id: str) -> Optional[Dict[str, Any]]:
     """Load specific project data"""
-    conn = sqlite3.connect('projectsData.db')
-    cursor = conn.cursor()
+    conn = get_conn()
 
-    cursor.execute("SELECT data_json FROM projects WHERE project_id = ?", (project_id,))
-    result = cursor.fetchone()
-    conn.close()
+    with get_db_lock():
+        result = conn.execute("SELECT data_json FROM projects WHERE project_id = ?", (project_id,)).fetchone()
 
     if result:
-        return json.loads(result[0])
+        return decode_project_data(result[0])
     return None
 
+@st.cache_data(ttl=60)
+def load_project_download(project_id: str) -> Optional[str]:
+    """Pretty-printed project JSON for the download button"""
+    project_data = load_project_data(project_id)
+    if project_data is None:
+        return None
+    return json.dumps(project_data, indent=2)
+
 st.set_page_config(
     page_title="Residential Design Planning ",
     page_icon="🏗️",
@@ -109,13 +184,27 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-init_db()
+EXISTING_COLUMNS = init_db()
+
+# Built once from the detected schema so SQLite can reuse the prepared statement.
+# Upserting updates the row in place, keeping created_at and the planner/layout columns.
+INSERT_COLS = ('project_id', 'project_name', 'updated_at', 'data_json') + tuple(
+    col for col in ('city_region', 'num_floors') if col in EXISTING_COLUMNS
+)
+INSERT_SQL = (
+    f"INSERT INTO projects ({','.join(INSERT_COLS)}) "
+    f"VALUES ({','.join('?' * len(INSERT_COLS))}) "
+    f"ON CONFLICT(project_id) DO UPDATE SET "
+    + ",".join(f"{col}=excluded.{col}" for col in INSERT_COLS[1:])
+)
 
 # Initialize session state
 if 'current_page' not in st.session_state:
     st.session_state.current_page = 'home'
 if 'project_data' not in st.session_state:
     st.session_state.project_data = {}
+if 'home_page' not in st.session_state:
+    st.session_state.home_page = 0
 if 'editing_project_id' not in st.session_state:
     st.session_state.editing_project_id = None
 
@@ -127,6 +216,9 @@ if "current_svg" not in st.session_state:
     st.session_state.current_svg = None
 
 def generate_and_render_svg(project_id: str):
+    # Imported on first use: the SVG/envelope stack is only needed for this button
+    from svg_mark2 import layout_to_svg, load_layout_from_db
+
     layout = load_layout_from_db(project_id)
     svg = layout_to_svg(layout)
 #-# store for UI rendering
@@ -149,8 +241,11 @@ def page_home():
             st.session_state.editing_project_id = None
             st.rerun()
 
-    # Load and display projects
-    projects = load_all_projects()
+    # Load and display projects (one extra row tells us whether an older page exists)
+    page = st.session_state.home_page
+    projects = load_all_projects(PROJECTS_PER_PAGE + 1, page * PROJECTS_PER_PAGE)
+    has_older = len(projects) > PROJECTS_PER_PAGE
+    projects = projects[:PROJECTS_PER_PAGE]
 
     if not projects:
         st.info("No projects yet. Create one to get started!")
@@ -178,6 +273,47 @@ def page_home():
 
                 st.divider()
 
+    if page > 0 or has_older:
+        col1, col2 = st.columns(2)
+
+        with col1:
+            if page > 0 and st.button("← Newer", use_container_width=True):
+                st.session_state.home_page -= 1
+                st.rerun()
+
+        with col2:
+            if has_older and st.button("Older →", use_container_width=True):
+                st.session_state.home_page += 1
+                st.rerun()
+
+# FORM OPTIONS
+CITIES = ("Noida", "Delhi", "Bangalore", "Mumbai", "Gurgaon", "Other")
+PLOT_TYPES = ("Center", "Corner", "T-point")
+BEDROOM_TYPES = ("Master", "Kids", "Guest")
+KITCHEN_TYPES = ("Closed", "Open")
+STAIR_POSITIONS = ("AI Decide", "Front", "Middle", "Side")
+VASTU_PREFERENCES = ("None", "Soft", "Strict")
+QUALITY_TIERS = ("Economy", "Standard", "Premium")
+FLOORING_TYPES = ("Vitrified Tiles", "Marble", "Wooden", "Mix")
+WINDOW_TYPES = ("UPVC", "Aluminum", "Wood")
+DOOR_TYPES = ("Flush", "Solid Wood", "Mixed")
+INTERIOR_SCOPES = ("Only Layout", "With Furniture", "Full Interior + Finishes")
+ROAD_LABELS = ("Front", "Left", "Right", "Back")
+
+def option_index(options, value, default: int = 0) -> int:
+    """Index of a saved value in a widget's options, or default if it isn't one"""
+    return options.index(value) if value in options else default
+
+def derive_form_fields(num_floors: str, road_flags: tuple) -> Dict[str, Any]:
+    """Values page_form derives from raw widget inputs"""
+    road_sides = [label for label, selected in zip(ROAD_LABELS, road_flags) if selected]
+    floor_count = FLOOR_COUNT.get(num_floors, 2)
+
+    return {
+        'road_sides': road_sides,
+        'floor_labels': ["Ground"] + [f"Floor {i}" for i in range(1, floor_count)],
+    }
+
 # FORM PAGE - COLLECT INPUTS
 def page_form():
     st.title("Enter Project Details")
@@ -203,10 +339,8 @@ def page_form():
 
     form_data['city_region'] = st.selectbox(
         "City/Region",
-        options=["Noida", "Delhi", "Bangalore", "Mumbai", "Gurgaon", "Other"],
-        index=0 if form_data.get('city_region') == "Noida" else (
-            1 if form_data.get('city_region') == "Delhi" else 0
-        )
+        options=CITIES,
+        index=option_index(CITIES, form_data.get('city_region'))
     )
 
     if form_data['city_region'] == "Other":
@@ -218,7 +352,7 @@ def page_form():
 
     form_data['num_floors'] = st.select_slider(
         "Number of Floors",
-        options=["Ground", "Ground + 1", "Ground + 2", "Ground + 3"],
+        options=list(FLOOR_COUNT),
         value=form_data.get('num_floors', "Ground + 1")
     )
 
@@ -260,10 +394,8 @@ def page_form():
 
     form_data['plot_type'] = st.radio(
         "Plot Type",
-        options=["Center", "Corner", "T-point"],
-        index=0 if form_data.get('plot_type') == "Center" else (
-            1 if form_data.get('plot_type') == "Corner" else 2
-        ),
+        options=PLOT_TYPES,
+        index=option_index(PLOT_TYPES, form_data.get('plot_type'), 2),
         horizontal=True
     )
 
@@ -278,11 +410,11 @@ def page_form():
     with col4:
         form_data['road_back'] = st.checkbox("Back", value=form_data.get('road_back', False))
 
-    form_data['road_sides'] = []
-    if form_data['road_front']: form_data['road_sides'].append("Front")
-    if form_data['road_left']: form_data['road_sides'].append("Left")
-    if form_data['road_right']: form_data['road_sides'].append("Right")
-    if form_data['road_back']: form_data['road_sides'].append("Back")
+    derived = derive_form_fields(
+        form_data['num_floors'],
+        (form_data['road_front'], form_data['road_left'], form_data['road_right'], form_data['road_back'])
+    )
+    form_data['road_sides'] = derived['road_sides']
 
     st.divider()
 
@@ -296,26 +428,16 @@ def page_form():
         help="Check if ground floor is for parking, residential from first floor"
     )
 
-    # Parse floor count
-    num_floors_str = form_data['num_floors']
-    if num_floors_str == "Ground":
-        floor_count = 1
-    elif num_floors_str == "Ground + 1":
-        floor_count = 2
-    elif num_floors_str == "Ground + 2":
-        floor_count = 3
-    elif num_floors_str == "Ground + 3":
-        floor_count = 4
-    else:
-        floor_count = 2
-
     if 'floors_config' not in form_data:
         form_data['floors_config'] = {}
 
     # Create tabs for each floor
-    floor_labels = ["Ground"] + [f"Floor {i}" for i in range(1, floor_count)]
-    floor_tabs = st.tabs(floor_labels)
+    floor_tabs = st.tabs(derived['floor_labels'])
 
+    # Widgets repeat per floor/bedroom with identical labels, so the explicit
+    # keys are what keep their IDs unique. form_data is a local copy and
+    # widget state is dropped once the form stops rendering, so nothing is
+    # held twice beyond this page.
     for floor_idx, tab in enumerate(floor_tabs):
         floor_name = f"floor_{floor_idx}"
 
@@ -378,10 +500,8 @@ def page_form():
                         with bed_col1:
                             bedroom_details[bed_key]['type'] = st.selectbox(
                                 "Type",
-                                options=["Master", "Kids", "Guest"],
-                                index=0 if bedroom_details[bed_key].get('type') == "Master" else (
-                                    1 if bedroom_details[bed_key].get('type') == "Kids" else 2
-                                ),
+                                options=BEDROOM_TYPES,
+                                index=option_index(BEDROOM_TYPES, bedroom_details[bed_key].get('type'), 2),
                                 key=f"type_bed_{floor_name}_{bed_num}"
                             )
 
@@ -422,8 +542,8 @@ def page_form():
                 with col2:
                     form_data[f"kitchen_{floor_name}"] = st.radio(
                         "Kitchen Type",
-                        options=["Closed", "Open"],
-                        index=0 if form_data.get(f"kitchen_{floor_name}", "Closed") == "Closed" else 1,
+                        options=KITCHEN_TYPES,
+                        index=option_index(KITCHEN_TYPES, form_data.get(f"kitchen_{floor_name}", "Closed"), 1),
                         key=f"kitchen_{floor_name}",
                         horizontal=True
                     )
@@ -446,8 +566,8 @@ def page_form():
                 with col2:
                     form_data[f"stair_pos_{floor_name}"] = st.selectbox(
                         "Stair Position",
-                        options=["AI Decide", "Front", "Middle", "Side"],
-                        index=0,
+                        options=STAIR_POSITIONS,
+                        index=option_index(STAIR_POSITIONS, form_data.get(f"stair_pos_{floor_name}")),
                         key=f"stair_pos_{floor_name}"
                     )
 
@@ -502,10 +622,8 @@ def page_form():
         st.markdown("**Vastu Preference**")
         form_data['vastu_preference'] = st.radio(
             "Vastu Orientation",
-            options=["None", "Soft", "Strict"],
-            index=0 if form_data.get('vastu_preference') == "None" else (
-                1 if form_data.get('vastu_preference') == "Soft" else 2
-            ),
+            options=VASTU_PREFERENCES,
+            index=option_index(VASTU_PREFERENCES, form_data.get('vastu_preference'), 2),
             key="vastu_radio"
         )
 
@@ -558,8 +676,8 @@ def page_form():
     with col2:
         form_data['quality_tier'] = st.selectbox(
             "Quality Tier",
-            options=["Economy", "Standard", "Premium"],
-            index=1 if form_data.get('quality_tier') == "Standard" else 0
+            options=QUALITY_TIERS,
+            index=option_index(QUALITY_TIERS, form_data.get('quality_tier'))
         )
 
     col1, col2, col3 = st.columns(3)
@@ -567,22 +685,22 @@ def page_form():
     with col1:
         form_data['flooring_type'] = st.selectbox(
             "Flooring",
-            options=["Vitrified Tiles", "Marble", "Wooden", "Mix"],
-            index=0 if form_data.get('flooring_type') == "Vitrified Tiles" else 0
+            options=FLOORING_TYPES,
+            index=option_index(FLOORING_TYPES, form_data.get('flooring_type'))
         )
 
     with col2:
         form_data['window_type'] = st.selectbox(
             "Windows",
-            options=["UPVC", "Aluminum", "Wood"],
-            index=1 if form_data.get('window_type') == "Aluminum" else 0
+            options=WINDOW_TYPES,
+            index=option_index(WINDOW_TYPES, form_data.get('window_type'))
         )
 
     with col3:
         form_data['door_type'] = st.selectbox(
             "Doors",
-            options=["Flush", "Solid Wood", "Mixed"],
-            index=1 if form_data.get('door_type') == "Solid Wood" else 0
+            options=DOOR_TYPES,
+            index=option_index(DOOR_TYPES, form_data.get('door_type'))
         )
 
     st.divider()
@@ -592,10 +710,8 @@ def page_form():
 
     form_data['interior_scope'] = st.radio(
         "Interior Design Scope",
-        options=["Only Layout", "With Furniture", "Full Interior + Finishes"],
-        index=0 if form_data.get('interior_scope') == "Only Layout" else (
-            1 if form_data.get('interior_scope') == "With Furniture" else 2
-        ),
+        options=INTERIOR_SCOPES,
+        index=option_index(INTERIOR_SCOPES, form_data.get('interior_scope'), 2),
         horizontal=True
     )
 
@@ -694,7 +810,7 @@ def page_view():
             st.rerun()
 
     with col2:
-        json_str = json.dumps(project_data, indent=2)
+        json_str = load_project_download(st.session_state.editing_project_id)
         st.download_button(
             label="⬇️ Download JSON",
             data=json_str,
@@ -1,6 +1,9 @@
 from dataclasses import dataclass
 from typing import List, Dict, Tuple
 from collections import defaultdict
+from functools import lru_cache
+
+import numpy as np
 
 EPS = 0.01
 MIN_CORRIDOR_AREA = 6.0
@@ -8,7 +11,8 @@ OUTER_WALL_THICKNESS = 0.6
 INNER_WALL_CLEARANCE = OUTER_WALL_THICKNESS / 2
 
 
-@dataclass
+# Frozen: build_envelope hands the same cached segments to every caller
+@dataclass(slots=True, frozen=True)
 class WallSegment:
     x1: float
     y1: float
@@ -17,7 +21,7 @@ class WallSegment:
     kind: str   # "outer" | "inner"
 
 
-@dataclass
+@dataclass(slots=True)
 class Cell:
     room_id: str
     purpose: str
@@ -37,20 +41,6 @@ class Cell:
             ((self.x + self.w, self.y + self.h), (self.x, self.y + self.h)),  # bottom
             ((self.x, self.y + self.h), (self.x, self.y))              # left
         ]
-def rooms_to_cells(layout: dict) -> List[Cell]:
-    cells = []
-    for r in layout["rooms"]:
-        cells.append(
-            Cell(
-                room_id=r["room_id"],
-                purpose=r["purpose"],
-                x=r["x"],
-                y=r["y"],
-                w=r["width"],
-                h=r["height"]
-            )
-        )
-    return cells
 def filter_noise_cells(cells: List[Cell]) -> List[Cell]:
     clean = []
     for c in cells:
@@ -68,98 +58,110 @@ def compute_union_silhouette(cells, grid=0.5):
     # ---------------------------------------------
     # 1. Rasterize occupied space
     # ---------------------------------------------
-    occupied = set()
+    if not cells:
+        return []
+
+    # Snapped grid indices per cell; occ[i, j] covers the grid square at
+    # (origin_x + i*grid, origin_y + j*grid)
+    spans = [
+        (round(c.x / grid), round(c.y / grid),
+         round((c.x + c.w) / grid), round((c.y + c.h) / grid))
+        for c in cells
+    ]
+    origin_i = min(s[0] for s in spans)
+    origin_j = min(s[1] for s in spans)
+    nx = max(s[2] for s in spans) - origin_i
+    ny = max(s[3] for s in spans) - origin_j
 
-    def snap(v):
-        return round(v / grid) * grid
+    occ = np.zeros((max(nx, 0), max(ny, 0)), dtype=bool)
+    for i0, j0, i1, j1 in spans:
+        occ[i0 - origin_i:i1 - origin_i, j0 - origin_j:j1 - origin_j] = True
 
-    for c in cells:
-        x0 = snap(c.x)
-        y0 = snap(c.y)
-        x1 = snap(c.x + c.w)
-        y1 = snap(c.y + c.h)
-
-        x = x0
-        while x < x1 - 1e-6:
-            y = y0
-            while y < y1 - 1e-6:
-                occupied.add((x, y))
-                y += grid
-            x += grid
+    origin_x = origin_i * grid
+    origin_y = origin_j * grid
 
     # ---------------------------------------------
     # 2. Detect boundary edges
     # ---------------------------------------------
-    edges = []
+    # A grid line segment is a boundary when exactly one of the two squares
+    # it separates is occupied; the False border covers the bbox edges.
+    # v_edges[i, j]: vertical line i between squares (i-1, j) and (i, j)
+    # h_edges[i, j]: horizontal line j between squares (i, j-1) and (i, j)
+    padded = np.pad(occ, 1)
+    v_edges = padded[1:, 1:-1] != padded[:-1, 1:-1]
+    h_edges = padded[1:-1, 1:] != padded[1:-1, :-1]
 
-    for (x, y) in occupied:
-        neighbors = {
-            "left":   (x - grid, y),
-            "right":  (x + grid, y),
-            "top":    (x, y - grid),
-            "bottom": (x, y + grid),
-        }
+    # ---------------------------------------------
+    # 3. Merge collinear edges
+    # ---------------------------------------------
+    # Runs come straight off the masks, so no merge_walls pass is needed
+    segments = []
+    for line, start, end in zip(*_grid_runs(v_edges)):
+        x = line * grid + origin_x
+        segments.append(WallSegment(x, start * grid + origin_y, x, end * grid + origin_y, "outer"))
+    for line, start, end in zip(*_grid_runs(h_edges.T)):
+        y = line * grid + origin_y
+        segments.append(WallSegment(start * grid + origin_x, y, end * grid + origin_x, y, "outer"))
 
-        # left boundary
-        if neighbors["left"] not in occupied:
-            edges.append(((x, y), (x, y + grid)))
+    return segments
 
-        # right boundary
-        if neighbors["right"] not in occupied:
-            edges.append(((x + grid, y), (x + grid, y + grid)))
 
-        # top boundary
-        if neighbors["top"] not in occupied:
-            edges.append(((x, y), (x + grid, y)))
+def _grid_runs(edges):
+    """
+    Run-length encodes a boundary mask laid out as edges[line, square].
+    Returns (line, start, end) lists; end is exclusive.
+    """
+    # +1 where a run starts, -1 just past where it ends; the padding closes
+    # runs touching either end of a line
+    steps = np.diff(np.pad(edges, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+    lines, starts = np.nonzero(steps == 1)
+    _, ends = np.nonzero(steps == -1)
 
-        # bottom boundary
-        if neighbors["bottom"] not in occupied:
-            edges.append(((x, y + grid), (x + grid, y + grid)))
+    return lines.tolist(), starts.tolist(), ends.tolist()
 
-    # ---------------------------------------------
-    # 3. Merge collinear edges
-    # ---------------------------------------------
-    segments = []
-    for (p1, p2) in edges:
-        segments.append(
-            WallSegment(
-                x1=p1[0], y1=p1[1],
-                x2=p2[0], y2=p2[1],
-                kind="outer"
-            )
-        )
 
-    return merge_walls(segments)
+def _centi(v):
+    """Integer line key in hundredths; exact to compare and cheap to hash"""
+    return round(v * 100)
+
+
+def _coalesce_spans(spans, tol):
+    """Sorts 1D (start, end) spans and merges the ones that touch or overlap"""
+    spans.sort()
+    s, e = spans[0]
+    for ns, ne in spans[1:]:
+        if ns <= e + tol:
+            e = max(e, ne)
+        else:
+            yield s, e
+            s, e = ns, ne
+    yield s, e
 
 
 def merge_walls(walls: List[WallSegment]) -> List[WallSegment]:
+    # Collinear walls share a kind and a constant coordinate, so bucket them
+    # by that and coalesce each bucket's spans (sort + sweep, not pairwise)
+    vertical = {}
+    horizontal = {}
     merged = []
 
     for w in walls:
-        merged_into_existing = False
+        if abs(w.x1 - w.x2) < EPS:
+            key = (w.kind, _centi(w.x1))
+            vertical.setdefault(key, (w.x1, []))[1].append((min(w.y1, w.y2), max(w.y1, w.y2)))
+        elif abs(w.y1 - w.y2) < EPS:
+            key = (w.kind, _centi(w.y1))
+            horizontal.setdefault(key, (w.y1, []))[1].append((min(w.x1, w.x2), max(w.x1, w.x2)))
+        else:
+            merged.append(w)
 
-        for m in merged:
-            if w.kind != m.kind:
-                continue
+    for (kind, _), (x, spans) in vertical.items():
+        for s, e in _coalesce_spans(spans, EPS):
+            merged.append(WallSegment(x, s, x, e, kind))
 
-            # vertical merge
-            if abs(w.x1 - w.x2) < EPS and abs(m.x1 - m.x2) < EPS:
-                if abs(w.x1 - m.x1) < EPS and (abs(w.y2 - m.y1) < EPS or abs(w.y1 - m.y2) < EPS):
-                    m.y1 = min(m.y1, w.y1, w.y2)
-                    m.y2 = max(m.y2, w.y1, w.y2)
-                    merged_into_existing = True
-                    break
-
-            # horizontal merge
-            if abs(w.y1 - w.y2) < EPS and abs(m.y1 - m.y2) < EPS:
-                if abs(w.y1 - m.y1) < EPS and (abs(w.x2 - m.x1) < EPS or abs(w.x1 - m.x2) < EPS):
-                    m.x1 = min(m.x1, w.x1, w.x2)
-                    m.x2 = max(m.x2, w.x1, w.x2)
-                    merged_into_existing = True
-                    break
-
-        if not merged_into_existing:
-            merged.append(w)
+    for (kind, _), (y, spans) in horizontal.items():
+        for s, e in _coalesce_spans(spans, EPS):
+            merged.append(WallSegment(s, y, e, y, kind))
 
     return merged
 
@@ -303,35 +305,21 @@ def merge_inner_partitions(walls, tol=0.01):
 
     for w in walls:
         if abs(w.x1 - w.x2) < tol:
-            x = round(w.x1, 2)
-            vertical.setdefault(x, []).append((w.y1, w.y2))
+            vertical.setdefault(_centi(w.x1), []).append((w.y1, w.y2))
         elif abs(w.y1 - w.y2) < tol:
-            y = round(w.y1, 2)
-            horizontal.setdefault(y, []).append((w.x1, w.x2))
+            horizontal.setdefault(_centi(w.y1), []).append((w.x1, w.x2))
 
     # merge vertical
-    for x, spans in vertical.items():
-        spans.sort()
-        s, e = spans[0]
-        for ns, ne in spans[1:]:
-            if ns <= e + tol:
-                e = max(e, ne)
-            else:
-                result.append(WallSegment(x, s, x, e, "inner"))
-                s, e = ns, ne
-        result.append(WallSegment(x, s, x, e, "inner"))
+    for key, spans in vertical.items():
+        x = key / 100
+        for s, e in _coalesce_spans(spans, tol):
+            result.append(WallSegment(x, s, x, e, "inner"))
 
     # merge horizontal
-    for y, spans in horizontal.items():
-        spans.sort()
-        s, e = spans[0]
-        for ns, ne in spans[1:]:
-            if ns <= e + tol:
-                e = max(e, ne)
-            else:
-                result.append(WallSegment(s, y, e, y, "inner"))
-                s, e = ns, ne
-        result.append(WallSegment(s, y, e, y, "inner"))
+    for key, spans in horizontal.items():
+        y = key / 100
+        for s, e in _coalesce_spans(spans, tol):
+            result.append(WallSegment(s, y, e, y, "inner"))
 
     return result
 
@@ -344,14 +332,14 @@ def compute_room_partition_walls(cells):
         if c.purpose == "circulation":
             continue
 
-        # left
-        walls.append(WallSegment(c.x, c.y, c.x, c.y + c.h, "inner"))
-        # right
-        walls.append(WallSegment(c.x + c.w, c.y, c.x + c.w, c.y + c.h, "inner"))
-        # top
-        walls.append(WallSegment(c.x, c.y, c.x + c.w, c.y, "inner"))
-        # bottom
-        walls.append(WallSegment(c.x, c.y + c.h, c.x + c.w, c.y + c.h, "inner"))
+        x1, y1 = c.x, c.y
+        x2, y2 = c.x + c.w, c.y + c.h
+        walls.extend((
+            WallSegment(x1, y1, x1, y2, "inner"),   # left
+            WallSegment(x2, y1, x2, y2, "inner"),   # right
+            WallSegment(x1, y1, x2, y1, "inner"),   # top
+            WallSegment(x1, y2, x2, y2, "inner"),   # bottom
+        ))
 
     return walls
 
@@ -371,7 +359,18 @@ def subtract_outer_from_inner(inner, outer, tol=0.01):
 
 
 def build_envelope(layout):
-    cells = filter_noise_cells(rooms_to_cells(layout))
+    # Walls depend only on room geometry, so re-rendering the same layout
+    # (e.g. every Streamlit rerun) reuses the cached result
+    rooms = tuple(
+        (r["room_id"], r["purpose"], r["x"], r["y"], r["width"], r["height"])
+        for r in layout["rooms"]
+    )
+    return list(_build_envelope(rooms))
+
+
+@lru_cache(maxsize=32)
+def _build_envelope(rooms):
+    cells = filter_noise_cells([Cell(*r) for r in rooms])
 
     outer = compute_union_silhouette(cells)
 
@@ -379,7 +378,7 @@ def build_envelope(layout):
     inner_clean = subtract_outer_from_inner(inner_raw, outer)
     inner = merge_walls(inner_clean)
 
-    return outer + inner
+    return tuple(outer + inner)
 
 
 
@@ -1,11 +1,17 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import List, Dict, Tuple, Optional
 import json
 import sqlite3
 import math
+import sys
+from collections import deque
+from functools import lru_cache
+from operator import attrgetter
 
+import numpy as np
 
-@dataclass
+
+@dataclass(slots=True)
 class Room:
     room_id: str
     name: str
@@ -18,6 +24,22 @@ class Room:
     y: float = 0
     locked: bool = False
     priority: int = 0
+    # Role flags read off the name once; names never change after construction
+    is_master: bool = field(init=False, repr=False, compare=False)
+    is_foyer: bool = field(init=False, repr=False, compare=False)
+    is_common: bool = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        # Interned so the many purpose/zone == checks hit the identity fast path;
+        # both come straight from the planner JSON, so they may not be strings
+        if isinstance(self.purpose, str):
+            self.purpose = sys.intern(self.purpose)
+        if isinstance(self.zone, str):
+            self.zone = sys.intern(self.zone)
+        name = self.name.lower()
+        self.is_master = "master" in name
+        self.is_foyer = "foyer" in name
+        self.is_common = "common" in name
     
     def bounds(self) -> Tuple[float, float, float, float]:
         return (self.x, self.y, self.x + self.width, self.y + self.height)
@@ -58,6 +80,49 @@ class Room:
         )
 
 
+def shares_wall(a: Room, b: Room, tol: float, min_overlap: float) -> bool:
+    """Check if two rooms share a wall at least min_overlap long"""
+    ax1, ay1, ax2, ay2 = a.bounds()
+    bx1, by1, bx2, by2 = b.bounds()
+    
+    if abs(ax2 - bx1) < tol or abs(ax1 - bx2) < tol:
+        return min(ay2, by2) - max(ay1, by1) > min_overlap
+    
+    if abs(ay2 - by1) < tol or abs(ay1 - by2) < tol:
+        return min(ax2, bx2) - max(ax1, bx1) > min_overlap
+    
+    return False
+
+
+# Placement priority by purpose; master bedroom/bath rank above the rest
+PURPOSE_PRIORITY = {"living": 100, "kitchen": 80, "bedroom": 70, "bathroom": 65}
+MASTER_PRIORITY_BONUS = {"bedroom": 20, "bathroom": 20}
+
+
+# Rooms the pipeline looks up by role; the first match in room order wins
+ROLE_TESTS = (
+    ("living", lambda r: r.purpose == "living"),
+    ("foyer", lambda r: r.is_foyer),
+    ("kitchen", lambda r: r.purpose == "kitchen"),
+    ("master_bed", lambda r: r.purpose == "bedroom" and r.is_master),
+    ("master_bath", lambda r: r.purpose == "bathroom" and r.is_master),
+    ("common_bath", lambda r: r.purpose == "bathroom" and r.is_common),
+)
+
+
+def index_roles(rooms: List[Room]) -> Dict:
+    """Role name -> Room (or None), plus "kids" -> non-master bedrooms"""
+    roles = dict.fromkeys(role for role, _ in ROLE_TESTS)
+    roles["kids"] = []
+    for r in rooms:
+        for role, test in ROLE_TESTS:
+            if roles[role] is None and test(r):
+                roles[role] = r
+        if r.purpose == "bedroom" and not r.is_master:
+            roles["kids"].append(r)
+    return roles
+
+
 class ImprovedZonePlacer:
     """Strategic placement with architectural logic"""
     
@@ -68,34 +133,27 @@ class ImprovedZonePlacer:
         self.h = plot_h - setbacks["front"] - setbacks["rear"]
         self.bounds = (self.x0, self.y0, self.x0 + self.w, self.y0 + self.h)
     
-    def place(self, rooms: List[Room]) -> List[Room]:
+    def place(self, rooms: List[Room], roles: Optional[Dict] = None) -> List[Room]:
+        if roles is None:
+            roles = index_roles(rooms)
+        
         # Set priorities
         for r in rooms:
-            if r.purpose == "living":
-                r.priority = 100
-            elif r.purpose == "bedroom" and "master" in r.name.lower():
-                r.priority = 90
-            elif r.purpose == "bathroom" and "master" in r.name.lower():
-                r.priority = 85
-            elif r.purpose == "kitchen":
-                r.priority = 80
-            elif r.purpose == "bedroom":
-                r.priority = 70
-            elif r.purpose == "bathroom":
-                r.priority = 65
-            elif "foyer" in r.name.lower():
-                r.priority = 95
-            else:
-                r.priority = 50
+            priority = PURPOSE_PRIORITY.get(r.purpose)
+            if priority is None:
+                priority = 95 if r.is_foyer else 50
+            elif r.is_master:
+                priority += MASTER_PRIORITY_BONUS.get(r.purpose, 0)
+            r.priority = priority
         
         # Separate rooms by type
-        living_room = next((r for r in rooms if r.purpose == "living"), None)
-        foyer = next((r for r in rooms if "foyer" in r.name.lower()), None)
-        kitchen = next((r for r in rooms if r.purpose == "kitchen"), None)
-        master_bed = next((r for r in rooms if r.purpose == "bedroom" and "master" in r.name.lower()), None)
-        master_bath = next((r for r in rooms if r.purpose == "bathroom" and "master" in r.name.lower()), None)
-        common_bath = next((r for r in rooms if r.purpose == "bathroom" and "common" in r.name.lower()), None)
-        kids_rooms = [r for r in rooms if r.purpose == "bedroom" and "master" not in r.name.lower()]
+        living_room = roles["living"]
+        foyer = roles["foyer"]
+        kitchen = roles["kitchen"]
+        master_bed = roles["master_bed"]
+        master_bath = roles["master_bath"]
+        common_bath = roles["common_bath"]
+        kids_rooms = roles["kids"]
         
         # STRATEGIC PLACEMENT
         # Top-left: Living room (main space)
@@ -155,15 +213,17 @@ class StrictAdjacencyRefiner:
     """Enforces critical adjacencies"""
     GRID = 0.5
     MIN_SHARED_WALL = 2.5
+    EDGE_MAP = {"front": "top", "rear": "bottom", "left": "left", "right": "right"}
     
-    def refine(self, rooms: List[Room], bounds, iterations=3) -> List[Room]:
+    def refine(self, rooms: List[Room], bounds, iterations=3, roles: Optional[Dict] = None) -> List[Room]:
         room_map = {r.room_id: r for r in rooms}
+        if roles is None:
+            roles = index_roles(rooms)
+        master_bed = roles["master_bed"]
+        master_bath = roles["master_bath"]
         
         for iteration in range(iterations):
             # CRITICAL: Master bathroom MUST attach to master bedroom
-            master_bed = next((r for r in rooms if r.purpose == "bedroom" and "master" in r.name.lower()), None)
-            master_bath = next((r for r in rooms if r.purpose == "bathroom" and "master" in r.name.lower()), None)
-            
             if master_bed and master_bath:
                 # Force attachment to right side
                 master_bath.x = master_bed.x + master_bed.width + 0.5
@@ -181,7 +241,7 @@ class StrictAdjacencyRefiner:
                         continue
                     
                     # Skip master bathroom (already handled)
-                    if target.purpose == "bathroom" and "master" in target.name.lower():
+                    if target.purpose == "bathroom" and target.is_master:
                         continue
                     
                     priority = 0
@@ -202,7 +262,7 @@ class StrictAdjacencyRefiner:
                 if anchor.purpose == "circulation" or target.purpose == "circulation":
                     continue
                 
-                if getattr(target, "locked", False):
+                if target.locked:
                     continue
                 
                 best = self._best_snap(anchor, target, rooms, bounds, edge)
@@ -225,8 +285,7 @@ class StrictAdjacencyRefiner:
             "bottom": (ax1, ay2 + 0.5)
         }
         
-        EDGE_MAP = {"front": "top", "rear": "bottom", "left": "left", "right": "right"}
-        preferred = EDGE_MAP.get(edge.get("edge_preference"))
+        preferred = self.EDGE_MAP.get(edge.get("edge_preference"))
         scored = []
         
         orig_x, orig_y = mover.x, mover.y
@@ -282,18 +341,16 @@ class StrictAdjacencyRefiner:
         room.y = self._snap_to_grid(room.y)
     
     def _overlaps_any(self, room, rooms, ignore):
+        # room is fixed for the whole scan, so its bounds are unpacked once
+        ax1, ay1, ax2, ay2 = room.bounds()
         for r in rooms:
             if r is room or r is ignore:
                 continue
-            if self._overlap(room, r):
+            bx1, by1, bx2, by2 = r.bounds()
+            if not (ax2 <= bx1 or ax1 >= bx2 or ay2 <= by1 or ay1 >= by2):
                 return True
         return False
     
-    def _overlap(self, a: Room, b: Room):
-        ax1, ay1, ax2, ay2 = a.bounds()
-        bx1, by1, bx2, by2 = b.bounds()
-        return not (ax2 <= bx1 or ax1 >= bx2 or ay2 <= by1 or ay1 >= by2)
-    
     def _wall_overlap(self, a, b, side):
         ax1, ay1, ax2, ay2 = a.bounds()
         bx1, by1, bx2, by2 = b.bounds()
@@ -311,37 +368,67 @@ class StrictOverlapResolver:
     MAX_ITERS = 200
     
     def resolve(self, rooms):
+        n = len(rooms)
+        # A pass depends only on the room positions it starts from, so once
+        # a start state repeats the remaining passes just cycle through the
+        # states seen since. Jump straight to the one MAX_ITERS would end on.
+        seen = {}
+        history = []
+        
         for iteration in range(self.MAX_ITERS):
             changed = False
             overlaps_found = 0
             
-            for i in range(len(rooms)):
-                for j in range(i + 1, len(rooms)):
+            boxes = [r.bounds() for r in rooms]
+            state = tuple(boxes)
+            first = seen.get(state)
+            if first is not None:
+                period = iteration - first
+                final = history[first + (self.MAX_ITERS - first) % period]
+                for r, (x, y, _, _) in zip(rooms, final):
+                    r.x, r.y = x, y
+                break
+            seen[state] = iteration
+            history.append(state)
+            
+            # Overlaps as of the start of this pass, all pairs in one
+            # broadcast. Until one of its rooms moves, a pair's entry stays
+            # valid; after that it is re-tested against the updated boxes.
+            start_overlaps = self._overlap_matrix(boxes).tolist()
+            moved = [False] * n
+            
+            for i in range(n):
+                row = start_overlaps[i]
+                for j in range(i + 1, n):
+                    if moved[i] or moved[j]:
+                        ax1, ay1, ax2, ay2 = boxes[i]
+                        bx1, by1, bx2, by2 = boxes[j]
+                        if ax2 <= bx1 or ax1 >= bx2 or ay2 <= by1 or ay1 >= by2:
+                            continue
+                    elif not row[j]:
+                        continue
+                    
                     a = rooms[i]
                     b = rooms[j]
                     
-                    if not self._overlaps(a, b):
-                        continue
-                    
                     overlaps_found += 1
                     
                     if a.purpose == b.purpose == "circulation":
                         continue
                     
-                    if getattr(a, "locked", False) and getattr(b, "locked", False):
+                    if a.locked and b.locked:
                         continue
                     
                     # NEVER separate master bathroom from master bedroom
                     if self._is_master_pair(a, b):
                         continue
                     
-                    resolved = self._apply_rules(a, b)
+                    resolved = self._apply_rules(a, b) or self._separate_by_priority(a, b)
+                    boxes[i] = a.bounds()
+                    boxes[j] = b.bounds()
+                    moved[i] = moved[j] = True
                     if resolved:
                         changed = True
-                        continue
-                    
-                    if self._separate_by_priority(a, b):
-                        changed = True
             
             if not changed and overlaps_found == 0:
                 return rooms
@@ -349,26 +436,21 @@ class StrictOverlapResolver:
         print(f"OverlapResolver: completed {self.MAX_ITERS} iterations")
         return rooms
     
+    def _overlap_matrix(self, boxes) -> np.ndarray:
+        """N x N array, True where boxes i and j (x1, y1, x2, y2) overlap; shared edges don't count"""
+        x1, y1, x2, y2 = np.array(boxes, dtype=float).reshape(-1, 4).T
+        return (
+            (x2[:, None] > x1[None, :]) & (x1[:, None] < x2[None, :])
+            & (y2[:, None] > y1[None, :]) & (y1[:, None] < y2[None, :])
+        )
+    
     def _is_master_pair(self, a: Room, b: Room) -> bool:
         """Check if these are master bedroom and bathroom"""
-        if "master" in a.name.lower() and "master" in b.name.lower():
+        if a.is_master and b.is_master:
             if {a.purpose, b.purpose} == {"bedroom", "bathroom"}:
                 return True
         return False
     
-    def _is_adjacent(self, a: Room, b: Room, tol=1.0) -> bool:
-        """Check if two rooms are adjacent (sharing a wall)"""
-        ax1, ay1, ax2, ay2 = a.bounds()
-        bx1, by1, bx2, by2 = b.bounds()
-        
-        if abs(ax2 - bx1) < tol or abs(ax1 - bx2) < tol:
-            return min(ay2, by2) - max(ay1, by1) > 1.0
-        
-        if abs(ay2 - by1) < tol or abs(ay1 - by2) < tol:
-            return min(ax2, bx2) - max(ax1, bx1) > 1.0
-        
-        return False
-    
     def _apply_rules(self, a: Room, b: Room) -> bool:
         # Kitchen must not be overlapped by bedroom
         if a.purpose == "kitchen" and b.purpose == "bedroom":
@@ -380,11 +462,11 @@ class StrictOverlapResolver:
         
         # Living room priority
         if a.purpose == "living":
-            if not getattr(a, "locked", False):
+            if not a.locked:
                 self._push_away(b, a)
             return True
         if b.purpose == "living":
-            if not getattr(b, "locked", False):
+            if not b.locked:
                 self._push_away(a, b)
             return True
         
@@ -397,19 +479,19 @@ class StrictOverlapResolver:
             return True
         
         # Foyer priority
-        if "foyer" in a.name.lower():
+        if a.is_foyer:
             self._push_away(b, a)
             return True
-        if "foyer" in b.name.lower():
+        if b.is_foyer:
             self._push_away(a, b)
             return True
         
         return False
     
     def _separate_by_priority(self, a: Room, b: Room) -> bool:
-        if getattr(a, "locked", False):
+        if a.locked:
             return self._push_away(b, a)
-        if getattr(b, "locked", False):
+        if b.locked:
             return self._push_away(a, b)
         
         if a.priority > b.priority:
@@ -426,38 +508,29 @@ class StrictOverlapResolver:
         ax1, ay1, ax2, ay2 = anchor.bounds()
         mx1, my1, mx2, my2 = mover.bounds()
         
-        dx_left = ax2 - mx1
-        dx_right = mx2 - ax1
-        dy_down = ay2 - my1
-        dy_up = my2 - ay1
+        # Penetration depth per escape direction: right, left, down, up.
+        # index() takes the first minimum, so ties keep that order.
+        depths = (ax2 - mx1, mx2 - ax1, ay2 - my1, my2 - ay1)
+        axis = depths.index(min(depths))
         
-        min_overlap = min(dx_left, dx_right, dy_down, dy_up)
-        
-        if min_overlap == dx_left:
-            mover.x = ax2 + self.CLEARANCE
-        elif min_overlap == dx_right:
-            mover.x = ax1 - mover.width - self.CLEARANCE
-        elif min_overlap == dy_down:
-            mover.y = ay2 + self.CLEARANCE
+        if axis < 2:
+            mover.x = ax2 + self.CLEARANCE if axis == 0 else ax1 - mover.width - self.CLEARANCE
         else:
-            mover.y = ay1 - mover.height - self.CLEARANCE
+            mover.y = ay2 + self.CLEARANCE if axis == 2 else ay1 - mover.height - self.CLEARANCE
         
         return True
-    
-    def _overlaps(self, a: Room, b: Room) -> bool:
-        ax1, ay1, ax2, ay2 = a.bounds()
-        bx1, by1, bx2, by2 = b.bounds()
-        return not (ax2 <= bx1 or ax1 >= bx2 or ay2 <= by1 or ay1 >= by2)
 
 
 class CorridorInserter:
-    def insert(self, rooms):
+    def insert(self, rooms, roles: Optional[Dict] = None):
         room_map = {r.room_id: r for r in rooms}
         corridors = []
         seen_pairs = set()
         
-        living_room = next((r for r in rooms if r.purpose == "living"), None)
-        master_bed = next((r for r in rooms if r.purpose == "bedroom" and "master" in r.name.lower()), None)
+        if roles is None:
+            roles = index_roles(rooms)
+        living_room = roles["living"]
+        master_bed = roles["master_bed"]
         
         if living_room and master_bed:
             corridors.append(Room.make_corridor(living_room, master_bed, width=5))
@@ -484,41 +557,32 @@ class CorridorInserter:
         return rooms + corridors
     
     def _is_adjacent(self, a: Room, b: Room, tol=1.0) -> bool:
-        ax1, ay1, ax2, ay2 = a.bounds()
-        bx1, by1, bx2, by2 = b.bounds()
-        
-        if abs(ax2 - bx1) < tol or abs(ax1 - bx2) < tol:
-            return min(ay2, by2) - max(ay1, by1) > 1.0
-        
-        if abs(ay2 - by1) < tol or abs(ay1 - by2) < tol:
-            return min(ax2, bx2) - max(ax1, bx1) > 1.0
-        
-        return False
+        return shares_wall(a, b, tol, min_overlap=1.0)
 
 
 class CorridorMerger:
     def merge(self, rooms: List[Room]) -> List[Room]:
-        corridors = [r for r in rooms if r.purpose == "circulation"]
+        corridors = deque(r for r in rooms if r.purpose == "circulation")
         others = [r for r in rooms if r.purpose != "circulation"]
         
         merged = []
         
         while corridors:
-            base = corridors.pop(0)
+            base = corridors.popleft()
             bx1, by1, bx2, by2 = base.bounds()
             
-            i = 0
-            while i < len(corridors):
-                c = corridors[i]
+            # Keep the corridors that don't merge, in order, for the next base
+            remaining = deque()
+            for c in corridors:
                 if self._can_merge(base, c):
                     cx1, cy1, cx2, cy2 = c.bounds()
                     bx1 = min(bx1, cx1)
                     by1 = min(by1, cy1)
                     bx2 = max(bx2, cx2)
                     by2 = max(by2, cy2)
-                    corridors.pop(i)
                 else:
-                    i += 1
+                    remaining.append(c)
+            corridors = remaining
             
             base.x = bx1
             base.y = by1
@@ -546,7 +610,7 @@ class CorridorMerger:
         return False
 
 
-@dataclass
+@dataclass(slots=True)
 class Door:
     from_room: str
     to_room: str
@@ -559,75 +623,72 @@ class DoorPlacer:
     def place(self, rooms: List[Room]) -> List[Door]:
         doors = []
         
-        for i, a in enumerate(rooms):
-            for b in rooms[i+1:]:
-                wall = self._shared_wall(a, b)
-                if not wall:
-                    continue
-                
-                orientation, x, y = wall
-                
-                if a.zone == b.zone == "private":
-                    if not (a.purpose == "bathroom" or b.purpose == "bathroom"):
-                        continue
-                
-                if a.purpose == b.purpose == "circulation":
+        for i, j, orientation, x, y in self._shared_walls(rooms):
+            a, b = rooms[i], rooms[j]
+            
+            if a.zone == b.zone == "private":
+                if not (a.purpose == "bathroom" or b.purpose == "bathroom"):
                     continue
-                
-                doors.append(
-                    Door(
-                        from_room=a.room_id,
-                        to_room=b.room_id,
-                        x=x,
-                        y=y,
-                        orientation=orientation
-                    )
+            
+            if a.purpose == b.purpose == "circulation":
+                continue
+            
+            doors.append(
+                Door(
+                    from_room=a.room_id,
+                    to_room=b.room_id,
+                    x=x,
+                    y=y,
+                    orientation=orientation
                 )
+            )
         
         return doors
     
-    def _shared_wall(self, a: Room, b: Room, tol=0.2):
-        ax1, ay1, ax2, ay2 = a.bounds()
-        bx1, by1, bx2, by2 = b.bounds()
-        
-        if abs(ax2 - bx1) < tol:
-            overlap = min(ay2, by2) - max(ay1, by1)
-            if overlap > 2:
-                return "vertical", ax2, max(ay1, by1) + overlap / 2
-        
-        if abs(ax1 - bx2) < tol:
-            overlap = min(ay2, by2) - max(ay1, by1)
-            if overlap > 2:
-                return "vertical", ax1, max(ay1, by1) + overlap / 2
-        
-        if abs(ay2 - by1) < tol:
-            overlap = min(ax2, bx2) - max(ax1, bx1)
-            if overlap > 2:
-                return "horizontal", max(ax1, bx1) + overlap / 2, ay2
-        
-        if abs(ay1 - by2) < tol:
-            overlap = min(ax2, bx2) - max(ax1, bx1)
-            if overlap > 2:
-                return "horizontal", max(ax1, bx1) + overlap / 2, ay1
-        
-        return None
+    def _shared_walls(self, rooms: List[Room], tol=0.2):
+        """(i, j, orientation, x, y) for every pair i < j sharing a wall, in pair order"""
+        if len(rooms) < 2:
+            return []
+        x1, y1, x2, y2 = np.array([r.bounds() for r in rooms], dtype=float).T
+        
+        lo_x = np.maximum(x1[:, None], x1[None, :])
+        lo_y = np.maximum(y1[:, None], y1[None, :])
+        overlap_x = np.minimum(x2[:, None], x2[None, :]) - lo_x
+        overlap_y = np.minimum(y2[:, None], y2[None, :]) - lo_y
+        
+        # Same precedence as testing a's right, left, bottom, top edge in turn
+        side = np.select(
+            [
+                (np.abs(x2[:, None] - x1[None, :]) < tol) & (overlap_y > 2),
+                (np.abs(x1[:, None] - x2[None, :]) < tol) & (overlap_y > 2),
+                (np.abs(y2[:, None] - y1[None, :]) < tol) & (overlap_x > 2),
+                (np.abs(y1[:, None] - y2[None, :]) < tol) & (overlap_x > 2),
+            ],
+            [1, 2, 3, 4],
+            default=0,
+        )
+        ii, jj = np.nonzero(np.triu(side, k=1))
+        
+        edge = {1: x2, 2: x1, 3: y2, 4: y1}
+        walls = []
+        for i, j, s, mid_x, mid_y in zip(
+            ii.tolist(), jj.tolist(), side[ii, jj].tolist(),
+            (lo_x + overlap_x / 2)[ii, jj].tolist(),
+            (lo_y + overlap_y / 2)[ii, jj].tolist(),
+        ):
+            if s <= 2:
+                walls.append((i, j, "vertical", float(edge[s][i]), mid_y))
+            else:
+                walls.append((i, j, "horizontal", mid_x, float(edge[s][i])))
+        return walls
 
 
 def can_expand(room, rooms, bounds, dx=0, dy=0, clearance=0.5, allow_into_circulation=True):
-    test = Room(
-        room_id=room.room_id,
-        name=room.name,
-        purpose=room.purpose,
-        width=room.width + dx,
-        height=room.height + dy,
-        zone=room.zone,
-        adjacency=room.adjacency,
-        x=room.x,
-        y=room.y
-    )
-    
     bx1, by1, bx2, by2 = bounds
-    x1, y1, x2, y2 = test.bounds()
+    # Bounds of the room grown by (dx, dy)
+    x1, y1 = room.x, room.y
+    x2 = x1 + (room.width + dx)
+    y2 = y1 + (room.height + dy)
     
     if x1 < bx1 or y1 < by1 or x2 > bx2 or y2 > by2:
         return False
@@ -650,20 +711,74 @@ def can_expand(room, rooms, bounds, dx=0, dy=0, clearance=0.5, allow_into_circul
     return True
 
 
+def rooms_near(room, rooms, reach, clearance=0.5):
+    """Rooms within clearance of room grown right/down by up to reach"""
+    x1, y1, x2, y2 = room.bounds()
+    x2 += reach
+    y2 += reach
+    
+    return [
+        r for r in rooms
+        if not (x2 + clearance <= r.x or
+                x1 >= r.x + r.width + clearance or
+                y2 + clearance <= r.y or
+                y1 >= r.y + r.height + clearance)
+    ]
+
+
+def expand_axis(room, rooms, bounds, attr, step, max_steps):
+    """Grow room.width or room.height by step while can_expand allows, at most max_steps times.
+    
+    A step that is blocked stays blocked as the room grows, so the first
+    blocked step is found by doubling then bisecting rather than trying each
+    step in turn. Sizes are still built by repeated addition, so the result
+    matches a step-by-step scan exactly.
+    """
+    sizes = [getattr(room, attr)]
+    for _ in range(max_steps):
+        sizes.append(sizes[-1] + step)
+    grow = {"dx": step} if attr == "width" else {"dy": step}
+    
+    def fits(k):
+        # Can the room grow from sizes[k] to sizes[k + 1]?
+        setattr(room, attr, sizes[k])
+        return can_expand(room, rooms, bounds, allow_into_circulation=False, **grow)
+    
+    # Steps below lo fit; the first blocked step (max_steps if none) is <= hi
+    lo, hi, probe = 0, max_steps, 1
+    while lo < hi:
+        k = min(lo + probe, hi) - 1
+        if not fits(k):
+            hi = k
+            break
+        lo = k + 1
+        probe *= 2
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if fits(mid):
+            lo = mid + 1
+        else:
+            hi = mid
+    
+    setattr(room, attr, sizes[lo])
+
+
 def clamp_to_bounds(room, bounds):
     xmin, ymin, xmax, ymax = bounds
     room.x = max(xmin, min(room.x, xmax - room.width))
     room.y = max(ymin, min(room.y, ymax - room.height))
 
 class LayoutQualityScorer:
-    def score(self, rooms: List[Room], doors: List[Door]) -> int:
+    def score(self, rooms: List[Room], doors: List[Door], roles: Optional[Dict] = None) -> int:
         score = 100
 
-        living = next((r for r in rooms if r.purpose == "living"), None)
+        if roles is None:
+            roles = index_roles(rooms)
+        living = roles["living"]
         corridors = [r for r in rooms if r.purpose == "circulation"]
         bedrooms = [r for r in rooms if r.purpose == "bedroom"]
         bathrooms = [r for r in rooms if r.purpose == "bathroom"]
-        kitchen = next((r for r in rooms if r.purpose == "kitchen"), None)
+        kitchen = roles["kitchen"]
 
         # 1️⃣ Living as corridor hub (BAD)
         if living:
@@ -697,27 +812,19 @@ class LayoutQualityScorer:
         return max(score, 0)
 
     def _shares_wall(self, a: Room, b: Room, tol=0.5) -> bool:
-        ax1, ay1, ax2, ay2 = a.bounds()
-        bx1, by1, bx2, by2 = b.bounds()
-
-        if abs(ax2 - bx1) < tol or abs(ax1 - bx2) < tol:
-            return min(ay2, by2) - max(ay1, by1) > 2
+        return shares_wall(a, b, tol, min_overlap=2)
 
-        if abs(ay2 - by1) < tol or abs(ay1 - by2) < tol:
-            return min(ax2, bx2) - max(ax1, bx1) > 2
 
-        return False
-def polish_layout(rooms: List[Room]):
+def polish_room(r: Room):
     """Tiny nudges only – no major movement"""
-    for r in rooms:
-        # straighten corridors
-        if r.purpose == "circulation":
-            r.x = round(r.x)
-            r.y = round(r.y)
+    # straighten corridors
+    if r.purpose == "circulation":
+        r.x = round(r.x)
+        r.y = round(r.y)
 
-        # align bathrooms vertically (plumbing logic)
-        if r.purpose == "bathroom":
-            r.x = round(r.x / 2) * 2
+    # align bathrooms vertically (plumbing logic)
+    elif r.purpose == "bathroom":
+        r.x = round(r.x / 2) * 2
 
 def generate_layout(plan_json: dict):
     """Enhanced layout generation pipeline"""
@@ -743,31 +850,27 @@ def generate_layout(plan_json: dict):
     
     bounds = (5, 5, 35, 35)
     
+    # Later phases only add or merge corridors, so the roles found now hold
+    roles = index_roles(rooms)
+    
     print("Phase 1: Strategic placement")
-    rooms = placer.place(rooms)
+    rooms = placer.place(rooms, roles)
     
     print("Phase 2: Enforce adjacencies")
-    rooms = StrictAdjacencyRefiner().refine(rooms, bounds, iterations=3)
+    rooms = StrictAdjacencyRefiner().refine(rooms, bounds, iterations=3, roles=roles)
     
     print("Phase 3: Resolve overlaps")
     rooms = StrictOverlapResolver().resolve(rooms)
     
     print("Phase 4: Re-enforce critical adjacencies")
-    rooms = StrictAdjacencyRefiner().refine(rooms, bounds, iterations=2)
-    
-    living_room = next((r for r in rooms if r.purpose == "living"), None)
-    kitchen = next((r for r in rooms if r.purpose == "kitchen"), None)
-    foyer = next((r for r in rooms if "foyer" in r.name.lower()), None)
+    rooms = StrictAdjacencyRefiner().refine(rooms, bounds, iterations=2, roles=roles)
     
-    if living_room:
-        living_room.locked = True
-    if kitchen:
-        kitchen.locked = True
-    if foyer:
-        foyer.locked = True
+    for role in ("living", "kitchen", "foyer"):
+        if roles[role]:
+            roles[role].locked = True
     
     print("Phase 5: Corridor insertion")
-    rooms = CorridorInserter().insert(rooms)
+    rooms = CorridorInserter().insert(rooms, roles)
     rooms = StrictOverlapResolver().resolve(rooms)
     rooms = CorridorMerger().merge(rooms)
     
@@ -776,7 +879,7 @@ def generate_layout(plan_json: dict):
             r.locked = True
     
     print("Phase 6: Final adjacency pass")
-    rooms = StrictAdjacencyRefiner().refine(rooms, bounds, iterations=1)
+    rooms = StrictAdjacencyRefiner().refine(rooms, bounds, iterations=1, roles=roles)
     
     print("Phase 7: Door placement")
     doors = DoorPlacer().place(rooms)
@@ -784,7 +887,7 @@ def generate_layout(plan_json: dict):
     print("Phase 8: Intelligent room expansion with circulation preservation")
     RESIZE_STEP = 0.5
     
-    for r in sorted(rooms, key=lambda x: x.priority, reverse=True):
+    for r in sorted(rooms, key=attrgetter("priority"), reverse=True):
         if r.purpose in ("bathroom", "circulation"):
             continue
         
@@ -792,35 +895,39 @@ def generate_layout(plan_json: dict):
             max_steps = 30
         elif r.purpose == "kitchen":
             max_steps = 18
-        elif r.purpose == "bedroom" and "master" in r.name.lower():
+        elif r.purpose == "bedroom" and r.is_master:
             max_steps = 20
         elif r.purpose == "bedroom":
             max_steps = 15
         else:
             max_steps = 10
         
-        for _ in range(max_steps):
-            if can_expand(r, rooms, bounds, dx=RESIZE_STEP, allow_into_circulation=False):
-                r.width += RESIZE_STEP
-            else:
-                break
+        # Only rooms near the area r can grow into are able to block it
+        # (one extra step of reach absorbs float drift in the growth)
+        nearby = rooms_near(r, rooms, reach=(max_steps + 1) * RESIZE_STEP)
         
-        for _ in range(max_steps):
-            if can_expand(r, rooms, bounds, dy=RESIZE_STEP, allow_into_circulation=False):
-                r.height += RESIZE_STEP
-            else:
-                break
-    
-    for r in rooms:
-        clamp_to_bounds(r, bounds)
+        expand_axis(r, nearby, bounds, "width", RESIZE_STEP, max_steps)
+        expand_axis(r, nearby, bounds, "height", RESIZE_STEP, max_steps)
     
     print("Layout generation complete!")
     
-    scorer = LayoutQualityScorer()
-    polish_layout(rooms)
-    quality_score = scorer.score(rooms, doors)
-
-    
+    # Clamp, polish and serialize each room in a single pass
+    out_rooms = []
+    for r in rooms:
+        clamp_to_bounds(r, bounds)
+        polish_room(r)
+        out_rooms.append({
+            "room_id": r.room_id,
+            "name": r.name,
+            "purpose": r.purpose,
+            "zone": r.zone,
+            "x": r.x,
+            "y": r.y,
+            "width": r.width,
+            "height": r.height
+        })
+    
+    quality_score = LayoutQualityScorer().score(rooms, doors, roles)
 
     return {
         "bounds": {
@@ -830,19 +937,7 @@ def generate_layout(plan_json: dict):
             "ymax": bounds[3]
         },
         "quality_score": quality_score,
-        "rooms": [
-            {
-                "room_id": r.room_id,
-                "name": r.name,
-                "purpose": r.purpose,
-                "zone": r.zone,
-                "x": r.x,
-                "y": r.y,
-                "width": r.width,
-                "height": r.height
-            }
-            for r in rooms
-        ],
+        "rooms": out_rooms,
         "doors": [
             {
                 "from": d.from_room,
@@ -857,31 +952,31 @@ def generate_layout(plan_json: dict):
 
 
 
+@lru_cache(maxsize=1)
+def _get_conn() -> sqlite3.Connection:
+    """Shared SQLite connection, opened once per process"""
+    conn = sqlite3.connect("projectsData.db", isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
 def save_layout_to_db(project_id: str, layout: dict):
-    conn = sqlite3.connect("projectsData.db")
-    cur = conn.cursor()
-    cur.execute(
+    # Autocommit connection, so the UPDATE is committed as it runs
+    _get_conn().execute(
         "UPDATE projects SET Layout6 = ? WHERE project_id = ?",
-        (json.dumps(layout, indent=2), project_id)
+        (json.dumps(layout, separators=(",", ":")), project_id)
     )
-    conn.commit()
-    conn.close()
     print(f"Layout saved to Layout6 for project {project_id}")
 
 
 if __name__ == "__main__":
-    import sqlite3
-    
     PROJECT_ID = "PROJ_20260125_090051"
     
-    conn = sqlite3.connect("projectsData.db")
-    cur = conn.cursor()
-    cur.execute(
+    row = _get_conn().execute(
         "SELECT Planned FROM projects WHERE project_id = ?",
         (PROJECT_ID,)
-    )
-    row = cur.fetchone()
-    conn.close()
+    ).fetchone()
     
     if not row:
         raise ValueError("Project not found or no Planned data")
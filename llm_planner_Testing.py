@@ -1,11 +1,56 @@
 import json
 import sqlite3
 import os
+import zlib
+import atexit
+import asyncio
+from functools import lru_cache
+from typing import Optional
 from dotenv import load_dotenv
-from groq import Groq
+import httpx
+from groq import Groq, AsyncGroq, DefaultHttpxClient, DefaultAsyncHttpxClient
 
 load_dotenv()
 
+# Set DEBUG_PLAN=1 to pretty-print the accepted plan
+DEBUG_PLAN = bool(os.getenv("DEBUG_PLAN"))
+
+DB_PATH = "projectsData.db"
+
+# No whitespace: fewer prompt tokens to Groq and smaller rows in the DB
+COMPACT_JSON = dict(separators=(",", ":"), ensure_ascii=False)
+
+# Per-connection cache settings; WAL is a property of the database file, so
+# only write connections set it (the UI's connection does the same)
+READ_PRAGMAS = "PRAGMA cache_size=-20000; PRAGMA temp_store=MEMORY;"
+WRITE_PRAGMAS = READ_PRAGMAS + " PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;"
+
+
+def _open_conn(path: str = DB_PATH, readonly: bool = False) -> sqlite3.Connection:
+    """Autocommit connection to the projects database"""
+    if readonly:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=30, isolation_level=None)
+        conn.executescript(READ_PRAGMAS)
+    else:
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.executescript(WRITE_PRAGMAS)
+    return conn
+
+
+@lru_cache(maxsize=2)
+def _shared_conn(readonly: bool) -> sqlite3.Connection:
+    conn = _open_conn(readonly=readonly)
+    atexit.register(conn.close)
+    return conn
+
+
+def _get_conn(readonly: bool = False) -> sqlite3.Connection:
+    """Shared read or write connection, reused across planner attempts"""
+    # One positional bool per mode, so every call style hits the same two
+    # cache entries and neither connection is ever evicted unclosed
+    return _shared_conn(bool(readonly))
+
+
 # def db_connection(project_name: str) -> dict:
 #     conn = sqlite3.connect("projectsData.db")
 #     cursor = conn.cursor()
@@ -20,37 +65,35 @@ load_dotenv()
     #     raise ValueError("Project not found")
 
     # return json.loads(row[0])   # IMPORTANT
-def db_connection(project_name: str) -> dict:
-    with sqlite3.connect("projectsData.db", timeout=30) as conn:
-        # conn.execute("PRAGMA journal_mode=WAL;")
-        # conn.execute("PRAGMA synchronous=NORMAL;")
-
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT data_json FROM projects WHERE project_id = ?",
-            (project_name,)
-        )
-        row = cursor.fetchone()
+def db_connection(project_name: str, conn: Optional[sqlite3.Connection] = None) -> dict:
+    conn = conn or _get_conn(readonly=True)
+    row = conn.execute(
+        "SELECT data_json FROM projects WHERE project_id = ?",
+        (project_name,)
+    ).fetchone()
 
     if not row:
         raise ValueError("Project not found")
 
-    return json.loads(row[0])
+    data = row[0]
+    if isinstance(data, bytes):  # the UI stores large projects zlib-compressed
+        data = zlib.decompress(data)
 
-import time
+    return json.loads(data)
 
-def update_planned(project_id: str, plans: dict):
-    with sqlite3.connect("projectsData.db", timeout=10) as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE projects SET Planned = ? WHERE project_id = ?",
-            (json.dumps(plans), project_id)
-        )
+import time
 
-        if cursor.rowcount == 0:
-            raise ValueError(f"Project {project_id} not found")
+def update_planned(project_id: str, plans: dict, conn: Optional[sqlite3.Connection] = None):
+    # A single autocommit UPDATE takes the write lock up front, so there is
+    # no read-to-write lock upgrade to hit SQLITE_BUSY on
+    conn = conn or _get_conn()
+    cursor = conn.execute(
+        "UPDATE projects SET Planned = ? WHERE project_id = ?",
+        (json.dumps(plans, **COMPACT_JSON), project_id)
+    )
 
-        conn.commit()
+    if cursor.rowcount == 0:
+        raise ValueError(f"Project {project_id} not found")
 
     print(f"Updated Planned for {project_id}")
 
@@ -78,10 +121,16 @@ def extract_constraints(site_data: dict) -> dict:
 
 # ---------------- VALIDATORS ----------------
 
-def validate_bathrooms(plan: dict, constraints: dict) -> list[str]:
+def index_rooms(plan: dict) -> dict:
+    """Lowercased room_id -> room, the form the validators match on"""
+    return {r["room_id"].lower(): r for r in plan["rooms"]}
+
+
+def validate_bathrooms(plan: dict, constraints: dict, rooms: Optional[dict] = None) -> list[str]:
     errors = []
 
-    rooms = {r["room_id"].lower(): r for r in plan["rooms"]}
+    if rooms is None:
+        rooms = index_rooms(plan)
     bathrooms = [rid for rid in rooms if "bath" in rid]
 
     required = len(constraints["attached_toilets"]) + constraints["common_baths"]
@@ -92,13 +141,11 @@ def validate_bathrooms(plan: dict, constraints: dict) -> list[str]:
         )
         return errors
 
-    # Check attached toilets
+    # Check attached toilets; ids are compared with underscores stripped
+    compact = {rid: rid.replace("_", "") for rid in rooms}
     for bed_id in constraints["attached_toilets"]:
-        bed_key = None
-        for rid in rooms:
-            if bed_id.replace("_", "") in rid.replace("_", ""):
-                bed_key = rid
-                break
+        needle = bed_id.replace("_", "")
+        bed_key = next((rid for rid, c in compact.items() if needle in c), None)
 
         if not bed_key:
             continue
@@ -156,12 +203,13 @@ def validate_morning_sun(plan: dict, constraints: dict) -> list[str]:
                 )
     return warnings #error
 
-def validate_foyer(plan: dict) -> list[str]:
+def validate_foyer(plan: dict, rooms: Optional[dict] = None) -> list[str]:
     entry = plan.get("entry_logic", {})
     if not entry.get("buffer_before_living"):
         return []
 
-    rooms = [r["room_id"].lower() for r in plan["rooms"]]
+    if rooms is None:
+        rooms = index_rooms(plan)
     if not any("foyer" in r for r in rooms):
         return ["buffer_before_living is true but no Foyer room exists"]
 
@@ -171,15 +219,47 @@ def validate_plan(plan: dict, constraints: dict) -> tuple[list[str], list[str]]:
     fatal_errors = []
     warnings = []
 
-    fatal_errors += validate_bathrooms(plan, constraints)
+    rooms = index_rooms(plan)
+
+    fatal_errors += validate_bathrooms(plan, constraints, rooms)
     fatal_errors += validate_kitchen(plan, constraints)
     fatal_errors += validate_entry_logic(plan)
-    fatal_errors += validate_foyer(plan)
+    fatal_errors += validate_foyer(plan, rooms)
     warnings += validate_morning_sun(plan, constraints)
 
     return fatal_errors, warnings
 
 
+def first_fatal_error(plan: dict, constraints: dict) -> Optional[str]:
+    """validate_plan's first fatal error, skipping the checks after it"""
+    rooms = index_rooms(plan)
+
+    errors = (
+        validate_bathrooms(plan, constraints, rooms)
+        or validate_kitchen(plan, constraints)
+        or validate_entry_logic(plan)
+        or validate_foyer(plan, rooms)
+    )
+    return errors[0] if errors else None
+
+
+def is_valid_result(result: dict, constraints: dict) -> bool:
+    return all(first_fatal_error(plan, constraints) is None for plan in result["plans"])
+
+
+def validate_result(result: dict, constraints: dict) -> tuple[list[str], list[str]]:
+    """validate_plan over every plan in one LLM response"""
+    fatal_errors = []
+    warnings = []
+
+    for plan in result["plans"]:
+        fe, w = validate_plan(plan, constraints)
+        fatal_errors += fe
+        warnings += w
+
+    return fatal_errors, warnings
+
+
 SYSTEM_PROMPT = """
 You are an architectural layout planner AI whose output is consumed directly
 by an automated geometric layout engine.
@@ -335,17 +415,65 @@ No explanations.
 
 """
 
+# httpx drops idle connections after 5s by default, shorter than a planner
+# attempt takes; keep them for a minute so retries reuse the TLS session
+GROQ_HTTP_LIMITS = httpx.Limits(
+    max_connections=20, max_keepalive_connections=8, keepalive_expiry=60
+)
+
+GROQ_MODEL = "llama-3.3-70b-versatile"
+
+# Retries of 429/5xx/connection errors inside the SDK, with exponential
+# backoff and jitter (honouring retry-after); the SDK default is 2
+GROQ_MAX_RETRIES = 4
+
+
+@lru_cache(maxsize=1)
+def _groq_api_key() -> str:
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        raise ValueError("GROQ_API_KEY not found")
+    return api_key
+
+
+@lru_cache(maxsize=1)
+def _shared_groq() -> Groq:
+    """Process-wide sync client, so every GroqClient shares one connection pool"""
+    return Groq(
+        api_key=_groq_api_key(),
+        max_retries=GROQ_MAX_RETRIES,
+        http_client=DefaultHttpxClient(limits=GROQ_HTTP_LIMITS)
+    )
+
+
 class GroqClient:
     def __init__(self):
-        api_key = os.getenv("GROQ_API_KEY")
-        if not api_key:
-            raise ValueError("GROQ_API_KEY not found")
-
-        self.client = Groq(api_key=api_key)
-        self.model = "llama-3.3-70b-versatile"
-    def generate_blueprint_plans(self, site_data: dict, n_plans: int = 1) -> dict:
-        constraints = extract_constraints(site_data)
+        self.client = _shared_groq()
+        # Per instance: an async pool's connections belong to the event
+        # loop that opened them, so it can't be shared across asyncio.run calls
+        self.aclient = AsyncGroq(
+            api_key=_groq_api_key(),
+            max_retries=GROQ_MAX_RETRIES,
+            http_client=DefaultAsyncHttpxClient(limits=GROQ_HTTP_LIMITS)
+        )
+        self.model = GROQ_MODEL
+        # (site_data, constraints, user_prompt) for the last site_data seen
+        self._site_cache = None
+
+    def _site_parts(self, site_data: dict) -> tuple[dict, str]:
+        """Constraints and user prompt for site_data, reused across retries"""
+        # Identity check: the cache holds a reference, so the id can't be
+        # recycled while the entry is live
+        if self._site_cache is None or self._site_cache[0] is not site_data:
+            user_prompt = f"""
+SITE_DATA:
+{json.dumps(site_data, **COMPACT_JSON)}
+"""
+            self._site_cache = (site_data, extract_constraints(site_data), user_prompt)
+        return self._site_cache[1], self._site_cache[2]
 
+    def _build_messages(self, site_data: dict, n_plans: int) -> list[dict]:
+        constraints, user_prompt = self._site_parts(site_data)
 
         constraint_block = f"""
 HARD CONSTRAINTS (NON-NEGOTIABLE):
@@ -359,8 +487,6 @@ HARD CONSTRAINTS (NON-NEGOTIABLE):
 
 Violating ANY constraint makes the plan INVALID.
 """
-        repair_note = getattr(self, "extra_repair_instruction", "")
-
         required_rooms_block = f"""
 REQUIRED ROOMS (MUST EXIST AS SEPARATE ROOM OBJECTS):
 
@@ -387,29 +513,64 @@ Bathroom rules:
         instruction = (
             constraint_block + 
             required_rooms_block +
-            PLANNER_INSTRUCTION.replace("{N_PLANS}", str(n_plans)) +
-            repair_note 
+            PLANNER_INSTRUCTION.replace("{N_PLANS}", str(n_plans))
         )
 
-        user_prompt = f"""
-SITE_DATA:
-{json.dumps(site_data, indent=2)}
-"""
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "assistant", "content": instruction},
+            {"role": "user", "content": user_prompt}
+        ]
+
+        # The repair note goes last so everything before it is byte-identical
+        # across attempts and Groq's prompt prefix cache can reuse it
+        repair_note = getattr(self, "extra_repair_instruction", "")
+        if repair_note:
+            messages.append({"role": "user", "content": repair_note})
+
+        return messages
 
+    def generate_blueprint_plans(self, site_data: dict, n_plans: int = 1) -> dict:
         response = self.client.chat.completions.create(
             model=self.model,
             temperature=0.2,
             max_tokens=2000,
             response_format={"type": "json_object"},
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "assistant", "content": instruction},
-                {"role": "user", "content": user_prompt}
-            ]
+            messages=self._build_messages(site_data, n_plans)
         )
 
         return json.loads(response.choices[0].message.content)
 
+    async def _generate_one(self, messages: list[dict]) -> dict:
+        response = await self.aclient.chat.completions.create(
+            model=self.model,
+            temperature=0.2,
+            max_tokens=2000,
+            response_format={"type": "json_object"},
+            messages=messages
+        )
+
+        result = json.loads(response.choices[0].message.content)
+        # Without a plans list the validators can't run; raising drops the
+        # candidate in generate_candidates, like an unparseable response
+        if not isinstance(result, dict) or not isinstance(result.get("plans"), list):
+            raise ValueError("Planner response has no plans list")
+
+        return result
+
+    async def generate_candidates(self, site_data: dict, k: int = 3, n_plans: int = 1) -> list[dict]:
+        """k independent generations of the same prompt, requested concurrently"""
+        messages = self._build_messages(site_data, n_plans)
+        results = await asyncio.gather(
+            *(self._generate_one(messages) for _ in range(k)),
+            return_exceptions=True
+        )
+
+        candidates = [r for r in results if not isinstance(r, BaseException)]
+        if not candidates:
+            raise results[0]
+        return candidates
+
 def build_repair_instruction(errors: list[str]) -> str:
     bullet_errors = "\n".join(f"- {e}" for e in errors)
 
@@ -432,60 +593,70 @@ All other constraints still apply.
 """
 
 
-if __name__ == "__main__":
-    project_id = "PROJ_20260125_090051"
-
+async def run_planner(project_id: str, max_retries: int = 5, candidates: int = 1) -> dict:
+    """
+    Generate, validate and save a plan, repairing on fatal errors.
+    candidates > 1 requests that many plans per attempt concurrently and
+    keeps the first valid one, at that many times the token spend.
+    """
     site_data = db_connection(project_id)
     planner = GroqClient()
     constraints = extract_constraints(site_data)
 
-    MAX_RETRIES = 5
     last_errors = None
     repair_note = ""
 
-    for attempt in range(1, MAX_RETRIES + 1):
-        print(f"\n[Attempt {attempt}] Generating plan...")
-
-        result = planner.generate_blueprint_plans(
-            site_data=site_data,
-            n_plans=1
-        )
-
-        fatal_errors = []
-        warnings = []
+    try:
+        for attempt in range(1, max_retries + 1):
+            print(f"\n[Attempt {attempt}] Generating {candidates} candidate plan(s)...")
+
+            results = await planner.generate_candidates(
+                site_data=site_data,
+                k=candidates,
+                n_plans=1
+            )
+
+            # Keep the first candidate that passes the quick check; if none
+            # does, repair from the first candidate's errors. Only the chosen
+            # one gets the full error and warning report.
+            result = next(
+                (r for r in results if is_valid_result(r, constraints)), results[0]
+            )
+            fatal_errors, warnings = validate_result(result, constraints)
+
+            if not fatal_errors:
+                if warnings:
+                    print("[WARNINGS]")
+                    for w in warnings:
+                        print(" -", w)
+
+                update_planned(project_id, result)
+                print("[SUCCESS] Valid plan saved.")
+                if DEBUG_PLAN:
+                    print(json.dumps(result, indent=2))
+                return result
+
+            else:
+                print("[INVALID PLAN]")
+                for e in fatal_errors:
+                    print(" -", e)
+
+                last_errors = fatal_errors
+                repair_note = build_repair_instruction(fatal_errors)
+
+                planner.extra_repair_instruction = repair_note
 
-        for plan in result["plans"]:
-            fe, w = validate_plan(plan, constraints)
-            fatal_errors += fe
-            warnings += w
-
-        if not fatal_errors:
-            if warnings:
-                print("[WARNINGS]")
-                for w in warnings:
-                    print(" -", w)
-
-            update_planned(project_id, result)
-            print("[SUCCESS] Valid plan saved.")
-            print(json.dumps(result, indent=2))
-            break
-
-        else:
-            print("[INVALID PLAN]")
-            for e in fatal_errors:
-                print(" -", e)
-
-            last_errors = fatal_errors
-            repair_note = build_repair_instruction(fatal_errors)
-
-            planner.extra_repair_instruction = repair_note
-
-    else:
         raise ValueError({
             "status": "FAILED_AFTER_RETRIES",
             "errors": last_errors
         })
+    finally:
+        # The async pool is bound to this event loop; close it before
+        # asyncio.run tears the loop down
+        await planner.aclient.close()
 
 
-    print(json.dumps(result, indent=2))
+if __name__ == "__main__":
+    project_id = "PROJ_20260125_090051"
 
+    asyncio.run(run_planner(project_id))
@@ -1,5 +1,10 @@
+import io
 import json
 import sqlite3
+import atexit
+import threading
+from functools import lru_cache
+from typing import TextIO
 from envelope_builder_mark2 import build_envelope, WallSegment
 
 OUTER_WALL_STROKE = 0.6
@@ -12,17 +17,45 @@ ROOM_STROKE = 0.25
 CORRIDOR_STROKE = 0.2
 DOOR_RADIUS = 0.4
 
+OUTER_WALL_FMT = (
+    '<line x1="%s" y1="%s" x2="%s" y2="%s" '
+    f'stroke="black" stroke-width="{OUTER_WALL_STROKE}" '
+    'stroke-linecap="butt" stroke-linejoin="miter"/>'
+)
+INNER_WALL_FMT = (
+    '<line x1="%s" y1="%s" x2="%s" y2="%s" '
+    f'stroke="#333" opacity="0.5" stroke-width="{INNER_WALL_STROKE}" '
+    'stroke-linecap="butt" stroke-linejoin="miter"/>'
+)
+LABEL_FMT = (
+    '<text x="%s" y="%s" font-size="1.1" text-anchor="middle" '
+    'dominant-baseline="middle" fill="#333">%s</text>'
+)
 
-def load_layout_from_db(project_id: str, db_path="projectsData.db") -> dict:
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
 
-    cur.execute(
-        "SELECT Layout6 FROM projects WHERE project_id = ?",
-        (project_id,)
+_DB_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=4)
+def _get_conn(db_path: str) -> sqlite3.Connection:
+    """Shared read-only connection per database, kept open across UI reruns"""
+    # Read-only: never creates the file or takes a write lock
+    conn = sqlite3.connect(
+        f"file:{db_path}?mode=ro", uri=True, timeout=30,
+        isolation_level=None, check_same_thread=False
     )
-    row = cur.fetchone()
-    conn.close()
+    conn.execute("PRAGMA cache_size=-20000")
+    atexit.register(conn.close)
+    return conn
+
+
+def load_layout_from_db(project_id: str, db_path="projectsData.db") -> dict:
+    conn = _get_conn(db_path)
+    with _DB_LOCK:  # the UI calls this from several Streamlit threads
+        row = conn.execute(
+            "SELECT Layout6 FROM projects WHERE project_id = ?",
+            (project_id,)
+        ).fetchone()
 
     if not row or not row[0]:
         raise ValueError("No layout found for project")
@@ -30,63 +63,42 @@ def load_layout_from_db(project_id: str, db_path="projectsData.db") -> dict:
     return json.loads(row[0])
 
 
-def generate_svg(layout: dict) -> str:
-    svg = [
+def write_svg(layout: dict, out: TextIO) -> None:
+    """Write the SVG for layout to out line by line, without building it in memory"""
+    out.write(
         f'<svg width="{SVG_SIZE}" height="{SVG_SIZE}" '
         f'viewBox="0 0 {VIEWBOX_SIZE} {VIEWBOX_SIZE}" '
         f'xmlns="http://www.w3.org/2000/svg">'
-    ]
+    )
 
     # BUILD ENVELOPE 
     walls = build_envelope(layout)
 
-    # outer walls first 
-    for w in walls:
-        if w.kind != "outer":
-            continue
-        svg.append(
-            f'<line x1="{w.x1}" y1="{w.y1}" '
-            f'x2="{w.x2}" y2="{w.y2}" '
-            f'stroke="black" stroke-width="{OUTER_WALL_STROKE}" '
-            f'stroke-linecap="butt" stroke-linejoin="miter"/>'
-        )
-
-    # inner walls on top 
+    # outer walls first, inner walls held back to draw on top
+    n_outer = 0
+    inner_lines = []
     for w in walls:
-        if w.kind != "inner":
-            continue
-        svg.append(
-            f'<line x1="{w.x1}" y1="{w.y1}" '
-            f'x2="{w.x2}" y2="{w.y2}" '
-            f'stroke="#333" opacity="0.5" stroke-width="{INNER_WALL_STROKE}" '
-            f'stroke-linecap="butt" stroke-linejoin="miter"/>'
-        )
+        if w.kind == "outer":
+            out.write("\n" + OUTER_WALL_FMT % (w.x1, w.y1, w.x2, w.y2))
+            n_outer += 1
+        elif w.kind == "inner":
+            inner_lines.append("\n" + INNER_WALL_FMT % (w.x1, w.y1, w.x2, w.y2))
+    out.writelines(inner_lines)
 
     # OPTIONAL: draw room labels only
-    for r in layout["rooms"]:
-        if r["purpose"] == "circulation":
-            continue
-        cx = r["x"] + r["width"] / 2
-        cy = r["y"] + r["height"] / 2
-
-        svg.append(
-            f'<text x="{cx}" y="{cy}" '
-            f'font-size="1.1" '
-            f'text-anchor="middle" '
-            f'dominant-baseline="middle" '
-            f'fill="#333">'
-            f'{r["name"]}</text>'
-        )
-    print(
-    "OUTER:",
-    sum(1 for w in walls if w.kind == "outer"),
-    "INNER:",
-    sum(1 for w in walls if w.kind == "inner")
-)
+    out.writelines(
+        "\n" + LABEL_FMT % (r["x"] + r["width"] / 2, r["y"] + r["height"] / 2, r["name"])
+        for r in layout["rooms"] if r["purpose"] != "circulation"
+    )
+    print("OUTER:", n_outer, "INNER:", len(inner_lines))
 
+    out.write("\n</svg>")
 
-    svg.append("</svg>")
-    return "\n".join(svg)     
+
+def generate_svg(layout: dict) -> str:
+    buf = io.StringIO()
+    write_svg(layout, buf)
+    return buf.getvalue()
 
 
 def save_svg(svg: str, output_path="output_Layout11_testing layout6_mark2_output.svg"):
@@ -101,7 +113,8 @@ if __name__ == "__main__":
     PROJECT_ID = "PROJ_20260125_090051" 
 
     layout = load_layout_from_db(PROJECT_ID)
-    svg = generate_svg(layout)
-    save_svg(svg)
+    with open("output_Layout11_testing layout6_mark2_output.svg", "w",
+              buffering=1 << 16, encoding="utf-8") as f:
+        write_svg(layout, f)
 
     print("SVG generated: output_layout1.svg")